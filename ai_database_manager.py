@@ -4,17 +4,134 @@ import json
 import sys
 import sqlite3
 import os
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 import log
 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; the stdlib json module is used when it isn't installed
+    orjson = None
+
+# Number of interactions written per import transaction, so very large
+# imports commit in bounded chunks instead of one unbounded journal
+IMPORT_BATCH_SIZE = 10000
+
+# Debug messages that are costly to build are only produced when this is set,
+# either by the AI_DB_DEBUG environment variable or the plugin's "debug" argument
+DEBUG_LOGGING = os.environ.get('AI_DB_DEBUG', '') not in ('', '0')
+
+# Import statements are kept as constants so the same SQL string is reused for
+# every row and served from the connection's statement cache
+STATEMENT_CACHE_SIZE = 256
+
+_SQL_STAGE_ENTRIES = 'INSERT INTO import_staging (key, value) SELECT key, value FROM json_each(?)'
+
+_SQL_STAGED_KEYS = '''
+    SELECT key, json_extract(value, '$.timestamp'), json_extract(value, '$.sessionId')
+    FROM import_staging WHERE key >= ? AND key < ?
+'''
+
+_SQL_INSERT_CREATED = 'INSERT INTO import_created (key, interaction_id) VALUES (?, ?)'
+
+_SQL_INSERT_INTERACTION = '''
+    INSERT INTO interactions (
+        type, timestamp, page, element, session_id,
+        scene_id, scene_title, current_time, duration, progress,
+        volume, playback_rate, button_text, button_class, raw_data
+    )
+    SELECT
+        json_extract(value, '$.type'),
+        json_extract(value, '$.timestamp'),
+        json_extract(value, '$.page'),
+        json_extract(value, '$.element'),
+        json_extract(value, '$.sessionId'),
+        json_extract(value, '$.data.sceneId'),
+        json_extract(value, '$.data.sceneTitle'),
+        json_extract(value, '$.data.currentTime'),
+        json_extract(value, '$.data.duration'),
+        json_extract(value, '$.data.progress'),
+        json_extract(value, '$.data.volume'),
+        json_extract(value, '$.data.playbackRate'),
+        json_extract(value, '$.data.buttonText'),
+        json_extract(value, '$.data.buttonClass'),
+        -- Arrays stored in the related tables are not kept in raw_data too;
+        -- non-matching entries map to a path that doesn't exist, a no-op
+        COALESCE(json_remove(
+            json_extract(value, '$.data'),
+            iif(json_array_length(value, '$.data.performers') > 0, '$.performers', '$.__unused'),
+            iif(json_array_length(value, '$.data.tags') > 0, '$.tags', '$.__unused'),
+            iif(json_array_length(value, '$.data.markers') > 0, '$.markers', '$.__unused'),
+            iif(json_type(value, '$.data.studio') = 'object'
+                AND json_extract(value, '$.data.studio') <> '{}', '$.studio', '$.__unused')
+        ), '{}')
+    FROM import_staging WHERE key = ?
+    ON CONFLICT (timestamp, session_id) DO NOTHING
+'''
+
+_SQL_INSERT_PERFORMERS = '''
+    INSERT INTO interaction_performers (interaction_id, performer_id, performer_name)
+    SELECT c.interaction_id, json_extract(p.value, '$.id'), json_extract(p.value, '$.name')
+    FROM import_created AS c
+    JOIN import_staging AS s ON s.key = c.key
+    JOIN json_each(s.value, '$.data.performers') AS p
+    ORDER BY c.key, p.key
+'''
+
+_SQL_INSERT_TAGS = '''
+    INSERT INTO interaction_tags (interaction_id, tag_id, tag_name)
+    SELECT c.interaction_id, json_extract(t.value, '$.id'), json_extract(t.value, '$.name')
+    FROM import_created AS c
+    JOIN import_staging AS s ON s.key = c.key
+    JOIN json_each(s.value, '$.data.tags') AS t
+    ORDER BY c.key, t.key
+'''
+
+_SQL_INSERT_MARKERS = '''
+    INSERT INTO interaction_markers (interaction_id, marker_id, marker_title, marker_time)
+    SELECT c.interaction_id, json_extract(m.value, '$.id'), json_extract(m.value, '$.title'), json_extract(m.value, '$.time')
+    FROM import_created AS c
+    JOIN import_staging AS s ON s.key = c.key
+    JOIN json_each(s.value, '$.data.markers') AS m
+    ORDER BY c.key, m.key
+'''
+
+_SQL_INSERT_STUDIOS = '''
+    INSERT INTO interaction_studios (interaction_id, studio_id, studio_name)
+    SELECT c.interaction_id, json_extract(s.value, '$.data.studio.id'), json_extract(s.value, '$.data.studio.name')
+    FROM import_created AS c
+    JOIN import_staging AS s ON s.key = c.key
+    WHERE json_type(s.value, '$.data.studio') = 'object'
+        AND json_extract(s.value, '$.data.studio') <> '{}'
+    ORDER BY c.key
+'''
+
+def json_loads(data):
+    """Parse JSON text, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps_bytes(obj):
+    """Serialize to compact UTF-8 JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    # Match orjson's output: UTF-8 text rather than \u escapes
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
 def main():
     """Main entry point for the AI Database Manager plugin"""
+    global DEBUG_LOGGING
     input_data = None
     
     if len(sys.argv) < 2:
         input_data = read_json_input()
-        log.LogDebug("Raw input: %s" % json.dumps(input_data))
+        if input_data.get('args', {}).get('debug'):
+            DEBUG_LOGGING = True
+        if DEBUG_LOGGING:
+            log.LogDebug("Raw input: %s" % json.dumps(input_data))
     else:
         log.LogDebug("Using command line inputs")
         mode = sys.argv[1]
@@ -39,55 +156,54 @@ def main():
 def read_json_input():
     """Read JSON input from stdin"""
     input_str = sys.stdin.read()
-    return json.loads(input_str)
+    return json_loads(input_str)
 
 def run(input_data, output):
     """Main execution logic"""
     mode_arg = input_data['args'].get("mode", "")
     
     try:
-        # Initialize database manager
-        db_manager = AIInteractionDB()
-        
-        if mode_arg == "create_db":
-            result = db_manager.create_database()
-            output["output"] = f"Database created successfully at {result}"
-            log.LogInfo(f"Database created at: {result}")
+        # Initialize database manager; one connection is shared by all operations
+        with AIInteractionDB() as db_manager:
+            if mode_arg == "create_db":
+                result = db_manager.create_database()
+                output["output"] = f"Database created successfully at {result}"
+                log.LogInfo(f"Database created at: {result}")
             
-        elif mode_arg == "import_json":
-            count = db_manager.import_from_json()
-            output["output"] = f"Successfully imported {count} interactions from localStorage"
-            log.LogInfo(f"Imported {count} interactions")
+            elif mode_arg == "import_json":
+                count = db_manager.import_from_json()
+                output["output"] = f"Successfully imported {count} interactions from localStorage"
+                log.LogInfo(f"Imported {count} interactions")
             
-        elif mode_arg == "export_json":
-            filename = db_manager.export_to_json()
-            output["output"] = f"Successfully exported to {filename}"
-            log.LogInfo(f"Exported to: {filename}")
+            elif mode_arg == "export_json":
+                filename = db_manager.export_to_json()
+                output["output"] = f"Successfully exported to {filename}"
+                log.LogInfo(f"Exported to: {filename}")
             
-        elif mode_arg == "sync":
-            imported, exported = db_manager.sync_with_localstorage()
-            output["output"] = f"Sync complete: imported {imported}, exported {exported}"
-            log.LogInfo(f"Sync: imported {imported}, exported {exported}")
+            elif mode_arg == "sync":
+                imported, exported = db_manager.sync_with_localstorage()
+                output["output"] = f"Sync complete: imported {imported}, exported {exported}"
+                log.LogInfo(f"Sync: imported {imported}, exported {exported}")
             
-        elif mode_arg == "import_fresh":
-            # This mode expects the user to have just exported fresh data from the browser
-            count = db_manager.import_from_json()
-            output["output"] = f"Fresh import complete: {count} interactions processed (duplicates skipped)"
-            log.LogInfo(f"Fresh import: {count} interactions processed")
+            elif mode_arg == "import_fresh":
+                # This mode expects the user to have just exported fresh data from the browser
+                count = db_manager.import_from_json()
+                output["output"] = f"Fresh import complete: {count} interactions processed (duplicates skipped)"
+                log.LogInfo(f"Fresh import: {count} interactions processed")
             
-        elif mode_arg == "stats":
-            stats = db_manager.get_statistics()
-            output["output"] = stats
-            log.LogInfo(f"Database statistics: {json.dumps(stats, indent=2)}")
+            elif mode_arg == "stats":
+                stats = db_manager.get_statistics()
+                output["output"] = stats
+                log.LogInfo(f"Database statistics: {json.dumps(stats, indent=2)}")
             
-        elif mode_arg == "cleanup":
-            cleaned = db_manager.cleanup_old_data()
-            output["output"] = f"Cleaned up {cleaned} old interactions"
-            log.LogInfo(f"Cleaned {cleaned} old interactions")
+            elif mode_arg == "cleanup":
+                cleaned = db_manager.cleanup_old_data()
+                output["output"] = f"Cleaned up {cleaned} old interactions"
+                log.LogInfo(f"Cleaned {cleaned} old interactions")
             
-        else:
-            output["error"] = f"Unknown mode: {mode_arg}"
-            log.LogError(f"Unknown mode: {mode_arg}")
+            else:
+                output["error"] = f"Unknown mode: {mode_arg}"
+                log.LogError(f"Unknown mode: {mode_arg}")
             
     except Exception as e:
         output["error"] = str(e)
@@ -132,99 +248,178 @@ class AIInteractionDB:
         # Ensure the directory exists
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         
+        # Shared connection, opened lazily so a missing database isn't created
+        self._conn = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Close the shared database connection"""
+        if self._conn is not None:
+            try:
+                # Keep query planner statistics fresh after large imports/cleanups;
+                # this is best effort, e.g. another writer may hold the lock
+                self._conn.execute('PRAGMA optimize')
+            except sqlite3.Error:
+                pass
+            finally:
+                self._conn.close()
+                self._conn = None
+    
+    @contextmanager
+    def _transaction(self):
+        """Run a block in a single transaction, rolling back if it raises"""
+        conn = self._connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        try:
+            yield cursor
+        except BaseException:
+            # SQLite may already have rolled back by itself (e.g. disk full)
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+    
+    def _connection(self):
+        """Return the shared connection, opening it on first use"""
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+    
+    def _connect(self):
+        """Open a connection to the database with performance PRAGMAs applied"""
+        conn = sqlite3.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE)
+        # Transactions are managed explicitly with BEGIN/COMMIT where needed
+        conn.isolation_level = None
+        # journal_mode is persistent in the file; the rest are per-connection
+        conn.executescript('''
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-64000;
+            PRAGMA foreign_keys=ON;
+            PRAGMA mmap_size=268435456;
+        ''')
+        return conn
+        
     def create_database(self):
         """Create the SQLite database with proper schema"""
         log.LogInfo("Creating AI interactions database...")
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create main interactions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS interactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                page TEXT,
-                element TEXT,
-                session_id TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        # Create the whole schema atomically
+        with self._transaction() as cursor:
+            # Create main interactions table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS interactions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    type TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    page TEXT,
+                    element TEXT,
+                    session_id TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 
-                -- Scene data
-                scene_id TEXT,
-                scene_title TEXT,
-                current_time REAL,
-                duration REAL,
-                progress REAL,
-                volume REAL,
-                playback_rate REAL,
+                    -- Scene data
+                    scene_id TEXT,
+                    scene_title TEXT,
+                    current_time REAL,
+                    duration REAL,
+                    progress REAL,
+                    volume REAL,
+                    playback_rate REAL,
                 
-                -- Button data
-                button_text TEXT,
-                button_class TEXT,
+                    -- Button data
+                    button_text TEXT,
+                    button_class TEXT,
                 
-                -- Full JSON data for complex fields
-                raw_data TEXT
-            )
-        ''')
-        
-        # Create performers table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS interaction_performers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                interaction_id INTEGER,
-                performer_id TEXT,
-                performer_name TEXT,
-                FOREIGN KEY (interaction_id) REFERENCES interactions (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        # Create tags table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS interaction_tags (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                interaction_id INTEGER,
-                tag_id TEXT,
-                tag_name TEXT,
-                FOREIGN KEY (interaction_id) REFERENCES interactions (id) ON DELETE CASCADE
-            )
-        ''')
+                    -- Full JSON data minus the arrays kept in the related tables
+                    raw_data TEXT
+                )
+            ''')
         
-        # Create markers table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS interaction_markers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                interaction_id INTEGER,
-                marker_id TEXT,
-                marker_title TEXT,
-                marker_time TEXT,
-                FOREIGN KEY (interaction_id) REFERENCES interactions (id) ON DELETE CASCADE
-            )
-        ''')
+            # Create performers table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS interaction_performers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    interaction_id INTEGER,
+                    performer_id TEXT,
+                    performer_name TEXT,
+                    FOREIGN KEY (interaction_id) REFERENCES interactions (id) ON DELETE CASCADE
+                )
+            ''')
+        
+            # Create tags table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS interaction_tags (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    interaction_id INTEGER,
+                    tag_id TEXT,
+                    tag_name TEXT,
+                    FOREIGN KEY (interaction_id) REFERENCES interactions (id) ON DELETE CASCADE
+                )
+            ''')
+        
+            # Create markers table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS interaction_markers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    interaction_id INTEGER,
+                    marker_id TEXT,
+                    marker_title TEXT,
+                    marker_time TEXT,
+                    FOREIGN KEY (interaction_id) REFERENCES interactions (id) ON DELETE CASCADE
+                )
+            ''')
+        
+            # Create studio table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS interaction_studios (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    interaction_id INTEGER,
+                    studio_id TEXT,
+                    studio_name TEXT,
+                    FOREIGN KEY (interaction_id) REFERENCES interactions (id) ON DELETE CASCADE
+                )
+            ''')
         
-        # Create studio table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS interaction_studios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                interaction_id INTEGER,
-                studio_id TEXT,
-                studio_name TEXT,
-                FOREIGN KEY (interaction_id) REFERENCES interactions (id) ON DELETE CASCADE
-            )
-        ''')
+            self._create_indexes(cursor)
         
-        # Create indexes for better query performance
+        log.LogInfo(f"Database created successfully at: {self.db_path}")
+        return str(self.db_path)
+    
+    def _create_indexes(self, cursor):
+        """Create indexes for better query performance"""
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_interactions_type ON interactions(type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_interactions_timestamp ON interactions(timestamp)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_interactions_scene_id ON interactions(scene_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_interactions_session_id ON interactions(session_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_interactions_created_at ON interactions(created_at)')
         
-        conn.commit()
-        conn.close()
-        
-        log.LogInfo(f"Database created successfully at: {self.db_path}")
-        return str(self.db_path)
+        # Unique index used to reject duplicate interactions on import
+        try:
+            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_interactions_dedup ON interactions(timestamp, session_id)')
+        except sqlite3.IntegrityError:
+            # Older databases may already hold duplicates (e.g. from concurrent
+            # imports); keep the earliest copy of each and retry
+            cursor.execute('''
+                DELETE FROM interactions
+                WHERE session_id IS NOT NULL AND id NOT IN (
+                    SELECT MIN(id) FROM interactions GROUP BY timestamp, session_id
+                )
+            ''')
+            log.LogWarning(f"Removed {cursor.rowcount} duplicate interactions before creating the dedup index")
+            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_interactions_dedup ON interactions(timestamp, session_id)')
+        
+        # Foreign key indexes for child lookups and ON DELETE CASCADE
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_perf_iid ON interaction_performers(interaction_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tags_iid ON interaction_tags(interaction_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_markers_iid ON interaction_markers(interaction_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_studios_iid ON interaction_studios(interaction_id)')
     
     def import_from_json(self, json_file=None):
         """Import interactions from JSON file or localStorage simulation"""
@@ -236,184 +431,199 @@ class AIInteractionDB:
             json_files = []
             
             # First check the plugin's backup directory
-            json_files.extend(self.json_backup_dir.glob("ai_interactions_*.json"))
+            json_files.extend(self._find_json_files(self.json_backup_dir))
             
             # Then check fallback directories (Downloads, etc.)
             for fallback_dir in self.fallback_json_dirs:
-                if fallback_dir.exists():
-                    json_files.extend(fallback_dir.glob("ai_interactions_*.json"))
+                if fallback_dir.is_dir():
+                    json_files.extend(self._find_json_files(fallback_dir))
             
             if not json_files:
                 log.LogWarning(f"No AI interactions JSON files found in {self.json_backup_dir} or fallback directories: {[str(d) for d in self.fallback_json_dirs]}")
                 return 0
                 
-            json_file = max(json_files, key=lambda f: f.stat().st_mtime)
+            json_file = Path(max(json_files)[1])
             log.LogInfo(f"Using most recent JSON file: {json_file}")
         
-        with open(json_file, 'r') as f:
-            interactions = json.load(f)
+        conn = self._connection()
+        cursor = conn.cursor()
         
-        if not interactions:
-            log.LogInfo("No interactions to import")
-            return 0
+        # Databases created by older versions may be missing newer indexes
+        self._create_indexes(cursor)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Let SQLite shred the file with json_each instead of building Python
+        # objects for every entry; the staging table keeps each entry's position
+        cursor.execute('CREATE TEMP TABLE import_staging (key INTEGER PRIMARY KEY, value TEXT)')
+        cursor.execute('CREATE TEMP TABLE import_created (key INTEGER PRIMARY KEY, interaction_id INTEGER)')
         
         imported_count = 0
         
-        for interaction in interactions:
-            # Extract main interaction data
-            data = interaction.get('data', {})
-            
-            # Check if this interaction already exists (based on timestamp and session_id)
-            cursor.execute('''
-                SELECT id FROM interactions 
-                WHERE timestamp = ? AND session_id = ?
-            ''', (interaction.get('timestamp'), interaction.get('sessionId')))
+        try:
+            cursor.execute(_SQL_STAGE_ENTRIES, (Path(json_file).read_text(encoding='utf-8'),))
+            total = cursor.rowcount
             
-            existing = cursor.fetchone()
-            if existing:
-                log.LogDebug(f"Skipping duplicate interaction: {interaction.get('type')} at {interaction.get('timestamp')}")
-                continue
-            
-            # Insert main interaction
-            cursor.execute('''
-                INSERT INTO interactions (
-                    type, timestamp, page, element, session_id,
-                    scene_id, scene_title, current_time, duration, progress,
-                    volume, playback_rate, button_text, button_class, raw_data
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                interaction.get('type'),
-                interaction.get('timestamp'),
-                interaction.get('page'),
-                interaction.get('element'),
-                interaction.get('sessionId'),
-                data.get('sceneId'),
-                data.get('sceneTitle'),
-                data.get('currentTime'),
-                data.get('duration'),
-                data.get('progress'),
-                data.get('volume'),
-                data.get('playbackRate'),
-                data.get('buttonText'),
-                data.get('buttonClass'),
-                json.dumps(data)
-            ))
-            
-            interaction_id = cursor.lastrowid
+            if total == 0:
+                log.LogInfo("No interactions to import")
+                return 0
             
-            # Insert performers
-            performers = data.get('performers', [])
-            for performer in performers:
-                cursor.execute('''
-                    INSERT INTO interaction_performers (interaction_id, performer_id, performer_name)
-                    VALUES (?, ?, ?)
-                ''', (interaction_id, performer.get('id'), performer.get('name')))
+            imported_count = self._import_interactions(cursor, total)
+        finally:
+            cursor.execute('DROP TABLE temp.import_staging')
+            cursor.execute('DROP TABLE temp.import_created')
+        
+        log.LogInfo(f"Successfully imported {imported_count} interactions")
+        return imported_count
+    
+    def _find_json_files(self, directory):
+        """List (mtime, path) for ai_interactions_*.json files in a directory with a single scandir pass"""
+        json_files = []
+        
+        # Unreadable directories and entries are skipped, as pathlib.glob did
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not (entry.name.startswith('ai_interactions_') and entry.name.endswith('.json')):
+                        continue
+                    try:
+                        if entry.is_file():
+                            json_files.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        continue
+        except OSError as e:
+            log.LogDebug(f"Skipping unreadable directory {directory}: {e}")
+        
+        return json_files
+    
+    def _import_interactions(self, cursor, total):
+        """Insert the staged interactions in chunked transactions"""
+        # Load the existing (timestamp, session_id) pairs once so known duplicates
+        # skip the insert entirely; the dedup index still catches anything else
+        cursor.execute('SELECT timestamp, session_id FROM interactions WHERE session_id IS NOT NULL')
+        existing = frozenset(cursor.fetchall())
+        
+        imported_count = 0
+        
+        for start in range(0, total, IMPORT_BATCH_SIZE):
+            end = min(start + IMPORT_BATCH_SIZE, total)
             
-            # Insert tags
-            tags = data.get('tags', [])
-            for tag in tags:
-                cursor.execute('''
-                    INSERT INTO interaction_tags (interaction_id, tag_id, tag_name)
-                    VALUES (?, ?, ?)
-                ''', (interaction_id, tag.get('id'), tag.get('name')))
+            # Commit in chunks so very large imports keep the journal bounded
+            with self._transaction():
+                inserted = self._insert_batch(cursor, start, end, existing)
             
-            # Insert markers
-            markers = data.get('markers', [])
-            for marker in markers:
-                cursor.execute('''
-                    INSERT INTO interaction_markers (interaction_id, marker_id, marker_title, marker_time)
-                    VALUES (?, ?, ?, ?)
-                ''', (interaction_id, marker.get('id'), marker.get('title'), marker.get('time')))
+            if DEBUG_LOGGING and inserted < end - start:
+                log.LogDebug(f"Skipped {end - start - inserted} duplicate interactions")
+            imported_count += inserted
             
-            # Insert studio
-            studio = data.get('studio')
-            if studio:
-                cursor.execute('''
-                    INSERT INTO interaction_studios (interaction_id, studio_id, studio_name)
-                    VALUES (?, ?, ?)
-                ''', (interaction_id, studio.get('id'), studio.get('name')))
+            # Progress logging for large imports
+            log.LogProgress(end / total)
+        
+        return imported_count
+    
+    def _insert_batch(self, cursor, start, end, existing):
+        """Insert staged entries start..end-1 and their related rows, returning how many were new"""
+        cursor.execute(_SQL_STAGED_KEYS, (start, end))
+        staged = cursor.fetchall()
+        
+        created_rows = []
+        
+        for key, timestamp, session_id in staged:
+            if (timestamp, session_id) in existing:
+                continue
             
-            imported_count += 1
+            # Insert main interaction; only a (timestamp, session_id) conflict is
+            # ignored, so malformed entries still fail with an IntegrityError
+            cursor.execute(_SQL_INSERT_INTERACTION, (key,))
             
-            # Progress logging for large imports
-            if imported_count % 100 == 0:
-                log.LogProgress(imported_count / len(interactions))
+            if cursor.rowcount:
+                created_rows.append((key, cursor.lastrowid))
         
-        conn.commit()
-        conn.close()
+        if not created_rows:
+            return 0
         
-        log.LogInfo(f"Successfully imported {imported_count} interactions")
-        return imported_count
+        # Related rows are shredded from the staged entries of the new interactions
+        cursor.executemany(_SQL_INSERT_CREATED, created_rows)
+        
+        # Insert performers
+        cursor.execute(_SQL_INSERT_PERFORMERS)
+        
+        # Insert tags
+        cursor.execute(_SQL_INSERT_TAGS)
+        
+        # Insert markers
+        cursor.execute(_SQL_INSERT_MARKERS)
+        
+        # Insert studio
+        cursor.execute(_SQL_INSERT_STUDIOS)
+        
+        cursor.execute('DELETE FROM import_created')
+        
+        return len(created_rows)
     
     def export_to_json(self):
         """Export all interactions to JSON file"""
         if not self.db_path.exists():
             raise Exception("Database does not exist. Please create it first.")
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connection()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
-        # Get all interactions with related data
+        # Get all interactions with related data aggregated to JSON in a single query
         cursor.execute('''
-            SELECT * FROM interactions ORDER BY timestamp DESC
+            SELECT i.type, i.timestamp, i.page, i.element, i.session_id, i.raw_data,
+                (SELECT json_group_array(json_object('id', performer_id, 'name', performer_name))
+                 FROM interaction_performers WHERE interaction_id = i.id) AS performers_json,
+                (SELECT json_group_array(json_object('id', tag_id, 'name', tag_name))
+                 FROM interaction_tags WHERE interaction_id = i.id) AS tags_json,
+                (SELECT json_group_array(json_object('id', marker_id, 'title', marker_title, 'time', marker_time))
+                 FROM interaction_markers WHERE interaction_id = i.id) AS markers_json,
+                (SELECT json_object('id', studio_id, 'name', studio_name)
+                 FROM interaction_studios WHERE interaction_id = i.id LIMIT 1) AS studio_json
+            FROM interactions i
+            ORDER BY i.timestamp DESC
         ''')
         
-        interactions = []
-        for row in cursor.fetchall():
-            interaction_id = row[0]
-            
-            # Get performers
-            cursor.execute('SELECT performer_id, performer_name FROM interaction_performers WHERE interaction_id = ?', (interaction_id,))
-            performers = [{'id': p[0], 'name': p[1]} for p in cursor.fetchall()]
-            
-            # Get tags
-            cursor.execute('SELECT tag_id, tag_name FROM interaction_tags WHERE interaction_id = ?', (interaction_id,))
-            tags = [{'id': t[0], 'name': t[1]} for t in cursor.fetchall()]
-            
-            # Get markers
-            cursor.execute('SELECT marker_id, marker_title, marker_time FROM interaction_markers WHERE interaction_id = ?', (interaction_id,))
-            markers = [{'id': m[0], 'title': m[1], 'time': m[2]} for m in cursor.fetchall()]
-            
-            # Get studio
-            cursor.execute('SELECT studio_id, studio_name FROM interaction_studios WHERE interaction_id = ?', (interaction_id,))
-            studio_row = cursor.fetchone()
-            studio = {'id': studio_row[0], 'name': studio_row[1]} if studio_row else None
-            
-            # Reconstruct interaction object
-            data = json.loads(row[16]) if row[16] else {}  # raw_data column
-            if performers:
-                data['performers'] = performers
-            if tags:
-                data['tags'] = tags
-            if markers:
-                data['markers'] = markers
-            if studio:
-                data['studio'] = studio
-            
-            interaction = {
-                'type': row[1],
-                'timestamp': row[2],
-                'page': row[3],
-                'element': row[4],
-                'sessionId': row[5],
-                'data': data
-            }
-            
-            interactions.append(interaction)
-        
-        conn.close()
-        
         # Export to JSON file in the plugin's backup directory
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         filename = self.json_backup_dir / f"ai_interactions_export_{timestamp}.json"
         
-        with open(filename, 'w') as f:
-            json.dump(interactions, f, indent=2)
+        # Stream rows straight from the cursor into a compact JSON array
+        exported_count = 0
+        with open(filename, 'wb') as f:
+            f.write(b'[')
+            for row in cursor:
+                performers = json_loads(row['performers_json'])
+                tags = json_loads(row['tags_json'])
+                markers = json_loads(row['markers_json'])
+                studio = json_loads(row['studio_json']) if row['studio_json'] else None
+                
+                # Reconstruct interaction object
+                data = json_loads(row['raw_data']) if row['raw_data'] else {}
+                if performers:
+                    data['performers'] = performers
+                if tags:
+                    data['tags'] = tags
+                if markers:
+                    data['markers'] = markers
+                if studio:
+                    data['studio'] = studio
+                
+                interaction = {
+                    'type': row['type'],
+                    'timestamp': row['timestamp'],
+                    'page': row['page'],
+                    'element': row['element'],
+                    'sessionId': row['session_id'],
+                    'data': data
+                }
+                
+                if exported_count:
+                    f.write(b',')
+                f.write(json_dumps_bytes(interaction))
+                exported_count += 1
+            f.write(b']')
         
-        log.LogInfo(f"Exported {len(interactions)} interactions to {filename}")
+        log.LogInfo(f"Exported {exported_count} interactions to {filename}")
         return str(filename)
     
     def sync_with_localstorage(self):
@@ -432,33 +642,28 @@ class AIInteractionDB:
         if not self.db_path.exists():
             return {"error": "Database does not exist"}
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connection()
         cursor = conn.cursor()
         
-        stats = {}
-        
-        # Total interactions
-        cursor.execute('SELECT COUNT(*) FROM interactions')
-        stats['total_interactions'] = cursor.fetchone()[0]
+        # Totals, distinct counts and date range in a single scan
+        cursor.execute('''
+            SELECT COUNT(*), COUNT(DISTINCT scene_id), COUNT(DISTINCT session_id),
+                   MIN(timestamp), MAX(timestamp)
+            FROM interactions
+        ''')
+        total, unique_scenes, unique_sessions, earliest, latest = cursor.fetchone()
         
         # Interactions by type
         cursor.execute('SELECT type, COUNT(*) FROM interactions GROUP BY type ORDER BY COUNT(*) DESC')
-        stats['by_type'] = dict(cursor.fetchall())
         
-        # Unique scenes
-        cursor.execute('SELECT COUNT(DISTINCT scene_id) FROM interactions WHERE scene_id IS NOT NULL')
-        stats['unique_scenes'] = cursor.fetchone()[0]
-        
-        # Date range
-        cursor.execute('SELECT MIN(timestamp), MAX(timestamp) FROM interactions')
-        date_range = cursor.fetchone()
-        stats['date_range'] = {'earliest': date_range[0], 'latest': date_range[1]}
-        
-        # Sessions
-        cursor.execute('SELECT COUNT(DISTINCT session_id) FROM interactions')
-        stats['unique_sessions'] = cursor.fetchone()[0]
+        stats = {
+            'total_interactions': total,
+            'by_type': dict(cursor.fetchall()),
+            'unique_scenes': unique_scenes,
+            'date_range': {'earliest': earliest, 'latest': latest},
+            'unique_sessions': unique_sessions
+        }
         
-        conn.close()
         return stats
     
     def cleanup_old_data(self, days_to_keep=30):
@@ -466,18 +671,14 @@ class AIInteractionDB:
         if not self.db_path.exists():
             return 0
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Delete old interactions (cascading to related tables)
-        cursor.execute('''
-            DELETE FROM interactions 
-            WHERE created_at < datetime('now', '-{} days')
-        '''.format(days_to_keep))
-        
-        cleaned_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        # Delete old interactions (cascading to related tables) in one transaction
+        with self._transaction() as cursor:
+            cursor.execute('''
+                DELETE FROM interactions 
+                WHERE created_at < datetime('now', ?)
+            ''', (f'-{days_to_keep} days',))
+            
+            cleaned_count = cursor.rowcount
         
         log.LogInfo(f"Cleaned up {cleaned_count} interactions older than {days_to_keep} days")
         return cleaned_count